@@ -6,16 +6,17 @@ Requirements:
 - Python 3.10 or higher
 - MCP SDK installed: pip install git+https://github.com/modelcontextprotocol/python-sdk.git
 """
+import asyncio
 from mcp.server.fastmcp import FastMCP
-from typing import Dict, Any
-from usda_api import get_ingredient_nutrition_profile
+from typing import Dict, Any, List
+from usda_api import get_ingredient_nutrition_profile_async
 
 # Initialize FastMCP server
 mcp = FastMCP("USDA Nutrition Profile Server")
 
 
 @mcp.tool()
-def get_ingredient_nutrition_profile_tool(query: str) -> Dict[str, Any]:
+async def get_ingredient_nutrition_profile_tool(query: str) -> Dict[str, Any]:
     """
     Get generic nutrition profile for an ingredient.
     
@@ -46,8 +47,9 @@ def get_ingredient_nutrition_profile_tool(query: str) -> Dict[str, Any]:
                 "message": "Ingredient name cannot be empty."
             }
         
-        # Call the existing function from usda_api
-        nutrition_profile = get_ingredient_nutrition_profile(query.strip())
+        # Await the async pipeline so the event loop stays free during the
+        # USDA round-trip and concurrent MCP clients overlap their I/O
+        nutrition_profile = await get_ingredient_nutrition_profile_async(query.strip())
         
         # Handle case where ingredient not found
         if nutrition_profile is None:
@@ -63,13 +65,63 @@ def get_ingredient_nutrition_profile_tool(query: str) -> Dict[str, Any]:
         
     except Exception as e:
         # Handle any errors that occur during API call
+        # (query is a required parameter, so it is always bound here)
         return {
             "error": "API request failed",
             "message": str(e),
-            "query": query if 'query' in locals() else "unknown"
+            "query": query
         }
 
 
+@mcp.tool()
+async def get_ingredient_nutrition_profiles_batch(queries: List[str]) -> List[Dict[str, Any]]:
+    """
+    Get generic nutrition profiles for several ingredients in one call.
+
+    Runs all lookups concurrently over a single shared HTTP/2 connection,
+    so N ingredients complete in roughly the time of one lookup instead
+    of N sequential round-trips. Useful for recipe-style requests.
+
+    Args:
+        queries: List of ingredient names (e.g., ['whole milk', 'apple'])
+
+    Returns:
+        List of results in the same order as the queries. Each entry is
+        either a nutrition profile (see get_ingredient_nutrition_profile_tool)
+        or an error dictionary with error and message fields.
+    """
+    if not queries:
+        return []
+
+    async def lookup(query: str) -> Dict[str, Any]:
+        # Mirror the single-query tool's validation and error handling
+        # per entry so one bad ingredient doesn't fail the whole batch
+        if not query or not query.strip():
+            return {
+                "error": "Invalid input",
+                "message": "Ingredient name cannot be empty."
+            }
+        try:
+            profile = await get_ingredient_nutrition_profile_async(query.strip())
+        except Exception as e:
+            return {
+                "error": "API request failed",
+                "message": str(e),
+                "query": query
+            }
+        if profile is None:
+            return {
+                "error": "Ingredient not found",
+                "message": f"No generic nutrition data found for '{query}'. Try a different ingredient name.",
+                "query": query
+            }
+        return profile
+
+    # The lookups all ride the server loop's shared client, so the batch
+    # multiplexes over warm connections
+    return list(await asyncio.gather(*(lookup(q) for q in queries)))
+
+
 if __name__ == "__main__":
     # Run the MCP server with HTTP transport
     mcp.run(transport="streamable-http")
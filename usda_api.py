@@ -1,12 +1,136 @@
-import requests
+import httpx
+import asyncio
 import os
-import json
-from typing import Dict, Any, Optional, List
+import io
+import orjson
+import ijson
+import hashlib
+import functools
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, NamedTuple
 from dotenv import load_dotenv
+from rapidfuzz import fuzz, process, utils
+
+# Redis is optional - used as a shared cache for USDA search responses when
+# a server is available. Without it we still have the in-process LRU cache.
+# The async client is used because every cache access happens inside a
+# coroutine; a blocking client could stall the whole event loop.
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Cache TTL for USDA search responses (24 hours)
+SEARCH_CACHE_TTL = 86400
+
+# Shorter TTL for "not found" results (1 hour) - agents often retry bad
+# queries with slight variations, but USDA data does get added over time
+MISS_CACHE_TTL = 3600
+
+# USDA FoodData Central endpoints
+SEARCH_URL = "https://api.nal.usda.gov/fdc/v1/foods/search"
+FOOD_URL = "https://api.nal.usda.gov/fdc/v1/food/{}"
+
+# Shared request headers - gzip cuts transfer size ~5-10x for the verbose
+# USDA JSON (httpx decompresses automatically)
+_HEADERS = {
+    "accept": "application/json",
+    "accept-encoding": "gzip, deflate"
+}
+
+# Lazily-created Redis client (None = not yet attempted, False = unavailable)
+_redis_client = None
+
+# Transient USDA statuses worth retrying
+_RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+async def _get_redis():
+    """
+    Return a shared async Redis client, or None if Redis is not installed,
+    not configured, or not reachable. The connection is attempted once
+    and the result is remembered. Both timeouts are capped so a hung
+    Redis can delay a lookup by at most a second instead of stalling the
+    event loop indefinitely.
+    """
+    global _redis_client
+    if _redis_client is None:
+        if redis is None:
+            _redis_client = False
+        else:
+            try:
+                client = redis.Redis.from_url(
+                    os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+                    socket_connect_timeout=1,
+                    socket_timeout=1,
+                )
+                await client.ping()
+                _redis_client = client
+            except Exception:
+                # Redis not running - fall back to the in-process cache only
+                _redis_client = False
+    return _redis_client or None
+
+
+def _search_cache_key(query: str, data_type: Optional[str]) -> str:
+    """Build the Redis cache key for a search query + data type filter."""
+    digest = hashlib.sha1(f"{query}|{data_type or ''}".encode("utf-8")).hexdigest()
+    return f"usda:search:{digest}"
+
+
+async def _cache_get_text(cache_key: str) -> Optional[str]:
+    """Look up cached response text in Redis; None on miss or Redis errors."""
+    client = await _get_redis()
+    if client:
+        try:
+            cached = await client.get(cache_key)
+            if cached is not None:
+                return cached.decode("utf-8") if isinstance(cached, bytes) else cached
+        except Exception:
+            pass  # Treat Redis errors as cache misses
+    return None
+
+
+async def _cache_set_text(cache_key: str, text: str) -> None:
+    """Store response text in Redis with the standard TTL (best-effort)."""
+    client = await _get_redis()
+    if client:
+        try:
+            await client.setex(cache_key, SEARCH_CACHE_TTL, text)
+        except Exception:
+            pass
+
+
+def _build_search_params(query: str, data_type: Optional[str], api_key: Optional[str],
+                         require_all_words: bool = True) -> Dict[str, str]:
+    """Build the query parameters for a USDA foods/search request."""
+    params = {
+        "query": query,
+        # The default page of 50 candidates is more than scoring ever needs
+        "pageSize": "25"
+    }
+
+    # For multi-word queries, let the server drop candidates missing any
+    # query word instead of transferring and scoring them here
+    if require_all_words and len(query.split()) > 1:
+        params["requireAllWords"] = "true"
+
+    # Add data type filter if provided
+    if data_type:
+        params["dataType"] = data_type
+
+    # Add API key if available
+    if api_key:
+        params["api_key"] = api_key
+
+    return params
+
 
 def search_foods(query: str, api_key: Optional[str] = None, data_type: Optional[str] = None) -> Dict[str, Any]:
     """
@@ -19,37 +143,233 @@ def search_foods(query: str, api_key: Optional[str] = None, data_type: Optional[
     
     Returns:
         Dictionary containing the API response with food data
-    
+
     Raises:
-        requests.RequestException: If the API request fails
+        httpx.HTTPError: If the API request fails
     """
-    base_url = "https://api.nal.usda.gov/fdc/v1/foods/search"
-    
-    # Build query parameters
-    params = {
-        "query": query
-    }
-    
-    # Add data type filter if provided
-    if data_type:
-        params["dataType"] = data_type
-    
-    # Get API key from parameter or environment variable
+    # Normalize the query so "Apple" and "apple " share a cache entry
+    query = query.strip().lower()
+
+    # Resolve the API key here so the cached layer sees a stable value
+    resolved_key = api_key or os.getenv("USDA_API_KEY")
+
+    return orjson.loads(_search_foods_raw(query, data_type, resolved_key))
+
+
+@functools.lru_cache(maxsize=512)
+def _search_foods_raw(query: str, data_type: Optional[str], api_key: Optional[str]) -> str:
+    """
+    Synchronous wrapper fetching the raw JSON text for a food search.
+
+    Results are cached in two tiers: this function's LRU cache for
+    in-process hits, and Redis (via _search_foods_async) so repeated
+    queries across processes skip the USDA round-trip for
+    SEARCH_CACHE_TTL seconds. The LRU holds the raw JSON string rather
+    than parsed dicts to keep cached entries immutable.
+    """
+    async def fetch() -> str:
+        async with new_async_client() as client:
+            return await _search_foods_async(client, query, data_type, api_key)
+
+    return asyncio.run(fetch())
+
+
+async def _get_with_retries(client: httpx.AsyncClient, url: str,
+                            params: Dict[str, str]) -> httpx.Response:
+    """GET with exponential backoff on transient USDA errors (429/5xx)."""
+    for attempt in range(3):
+        response = await client.get(url, params=params, headers=_HEADERS)
+        if response.status_code in _RETRY_STATUSES and attempt < 2:
+            await asyncio.sleep(0.2 * (2 ** attempt))
+            continue
+        response.raise_for_status()  # Raise an exception for bad status codes
+        return response
+
+
+async def _search_foods_async(client: httpx.AsyncClient, query: str,
+                              data_type: Optional[str], api_key: Optional[str]) -> str:
+    """
+    Async variant of search_foods for concurrent tier searches.
+    Returns the raw JSON text so callers can stream-parse only the fields
+    they need. Shares the Redis cache with the synchronous path.
+    """
+    query = query.strip().lower()
+
+    cache_key = _search_cache_key(query, data_type)
+    cached = await _cache_get_text(cache_key)
+    if cached is not None:
+        return cached
+
+    params = _build_search_params(query, data_type, api_key)
+
+    response = await _get_with_retries(client, SEARCH_URL, params)
+    text = response.text
+
+    # requireAllWords can be too strict (e.g. descriptions wording the
+    # ingredient differently); retry once without it before giving up
+    if "requireAllWords" in params and not _has_foods(text):
+        params = _build_search_params(query, data_type, api_key,
+                                      require_all_words=False)
+        response = await _get_with_retries(client, SEARCH_URL, params)
+        text = response.text
+
+    await _cache_set_text(cache_key, text)
+
+    return text
+
+
+def _has_foods(raw: str) -> bool:
+    """Cheaply check whether a search response contains any foods."""
+    items = ijson.items(io.BytesIO(raw.encode("utf-8")), "foods.item")
+    return next(items, None) is not None
+
+
+def new_async_client() -> httpx.AsyncClient:
+    """
+    Create an HTTP/2 client suitable for concurrent USDA requests.
+    The transport retries connection failures; status-level retries are
+    handled by _get_with_retries.
+
+    For callers that own and close the client (the sync/CLI paths).
+    Coroutines running on a long-lived loop should use
+    _shared_async_client so connections stay alive across calls.
+    """
+    return httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(http2=True, retries=3),
+        timeout=10.0,
+    )
+
+
+# One shared client per running event loop. A single module-level client
+# would break across the separate loops the sync wrappers create with
+# asyncio.run; weakly keying by loop lets a loop's client die with it.
+_loop_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _shared_async_client() -> httpx.AsyncClient:
+    """
+    Return the shared AsyncClient for the running event loop, creating it
+    on first use. On the MCP server's long-lived loop this keeps USDA
+    connections alive across tool invocations instead of paying a fresh
+    TCP+TLS handshake per lookup.
+    """
+    loop = asyncio.get_running_loop()
+    client = _loop_clients.get(loop)
+    if client is None or client.is_closed:
+        client = new_async_client()
+        _loop_clients[loop] = client
+    return client
+
+
+async def _search_all_tiers(client: httpx.AsyncClient, query: str,
+                            api_key: Optional[str]) -> List[str]:
+    """
+    Fire the three fallback-tier searches concurrently and return their
+    raw JSON texts as [Foundation/SR Legacy, Survey (FNDDS), all types].
+
+    The serial fallback paid up to 3x the network round-trip when the
+    answer was only in the last tier; gathering the three independent
+    requests overlaps them onto roughly one round-trip.
+    """
+    return list(await asyncio.gather(
+        _search_foods_async(client, query, "Foundation,SR Legacy", api_key),
+        _search_foods_async(client, query, "Survey (FNDDS)", api_key),
+        _search_foods_async(client, query, None, api_key),
+    ))
+
+
+# Scalar food fields needed for scoring and the final profile metadata
+_META_FIELDS = frozenset([
+    "fdcId", "description", "dataType", "commonNames", "additionalDescriptions"
+])
+
+
+def _extract_food_meta(raw: str) -> List[Dict[str, Any]]:
+    """
+    Stream-parse a foods/search response, keeping only the per-food fields
+    that scoring needs.
+
+    A full parse materializes ~50 fields and 30+ nutrient dicts per food,
+    but scoring only looks at a handful of scalars; the event-level ijson
+    walk skips building all those intermediate objects.
+    """
+    foods = []
+    current = None
+    for prefix, event, value in ijson.parse(io.BytesIO(raw.encode("utf-8"))):
+        if prefix == "foods.item":
+            if event == "start_map":
+                current = {}
+            elif event == "end_map":
+                foods.append(current)
+                current = None
+        elif current is not None:
+            if prefix == "foods.item.foodCategory" and event == "string":
+                # foodCategory is a plain string in search responses
+                current["foodCategory"] = value
+            elif prefix == "foods.item.foodCategory.description":
+                # ...but an object in some data types
+                current["foodCategory"] = value
+            else:
+                field = prefix[11:]  # Strip the "foods.item." prefix
+                if field in _META_FIELDS:
+                    current[field] = value
+    return foods
+
+
+async def _get_food_by_id(client: httpx.AsyncClient, fdc_id: int,
+                          api_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Fetch a single food by FDC ID from the per-food endpoint.
+
+    The per-food response carries one food instead of ~50 candidates, so
+    fetching the winner's nutrients this way is far cheaper than carrying
+    full nutrient arrays through the search stage.
+    """
+    params = {"format": "full"}
     if api_key:
         params["api_key"] = api_key
-    elif os.getenv("USDA_API_KEY"):
-        params["api_key"] = os.getenv("USDA_API_KEY")
-    
-    # Set headers
-    headers = {
-        "accept": "application/json"
-    }
-    
-    # Make the API request
-    response = requests.get(base_url, params=params, headers=headers)
-    response.raise_for_status()  # Raise an exception for bad status codes
-    
-    return response.json()
+
+    response = await _get_with_retries(client, FOOD_URL.format(fdc_id), params)
+
+    return orjson.loads(response.content)
+
+
+class Nutrient(NamedTuple):
+    """
+    One nutrient entry in the flat shape used by the nutrition profile.
+
+    A response can carry thousands of nutrient records; a NamedTuple is a
+    fraction of the size of an equivalent dict, so intermediate records
+    stay slotted and are only converted to dicts (via _asdict) at the
+    JSON-serialization boundary.
+    """
+    nutrientId: Optional[int]
+    nutrientName: Optional[str]
+    nutrientNumber: Optional[str]
+    value: Optional[float]
+    unitName: Optional[str]
+    percentDailyValue: Optional[float]
+    rank: Optional[int]
+
+
+def _flatten_detail_nutrients(food_detail: Dict[str, Any]) -> List[Nutrient]:
+    """
+    Convert the per-food endpoint's nested foodNutrients entries
+    ({"nutrient": {...}, "amount": ...}) into flat Nutrient records.
+    """
+    flattened = []
+    for entry in food_detail.get("foodNutrients", []):
+        nutrient = entry.get("nutrient", {})
+        flattened.append(Nutrient(
+            nutrientId=nutrient.get("id"),
+            nutrientName=nutrient.get("name"),
+            nutrientNumber=nutrient.get("number"),
+            value=entry.get("amount"),
+            unitName=nutrient.get("unitName"),
+            percentDailyValue=entry.get("percentDailyValue"),
+            rank=nutrient.get("rank"),
+        ))
+    return flattened
 
 
 def extract_ingredient_info(api_response: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -83,7 +403,8 @@ def extract_ingredient_info(api_response: Dict[str, Any]) -> List[Dict[str, Any]
             "nutrients": []
         }
         
-        # Extract nutrient information
+        # Extract nutrient information - the returned list is the JSON
+        # boundary here, so build the dicts directly
         food_nutrients = food.get("foodNutrients", [])
         for nutrient in food_nutrients:
             nutrient_info = {
@@ -117,94 +438,212 @@ def get_ingredient_info(query: str, api_key: Optional[str] = None) -> List[Dict[
     return extract_ingredient_info(api_response)
 
 
-def _score_relevance(food: Dict[str, Any], query: str, position: int) -> float:
+def _lemma(word: str) -> str:
+    """
+    Reduce a simple English plural to its base form ("crackers" -> "cracker").
+
+    A deliberately tiny stemmer: strip a trailing "s" unless the word is
+    short or ends in "ss"/"us"/"is" (e.g. "swiss", "citrus"). Enough for
+    food words; a real lemmatizer would be overkill at import time.
+    """
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+# Common compound food indicators to penalize (especially when they start the
+# description). Stored as lemmas so singular and plural forms both match.
+COMPOUND_SET = frozenset(_lemma(w) for w in [
+    "cheese", "crackers", "bread", "cookies", "cake",
+    "soup", "sauce", "dressing", "cereal", "bar", "drink",
+    "juice", "spread", "butter", "yogurt"
+])
+
+# Processed/preserved forms to penalize when searching for fresh/liquid
+PROCESSED_SET = frozenset(_lemma(w) for w in [
+    "dry", "powdered", "powder", "dehydrated", "canned", "frozen",
+    "concentrated", "evaporated", "condensed"
+])
+
+
+@dataclass(frozen=True)
+class _QueryContext:
+    """
+    Query-side values needed by _score_relevance, computed once per query.
+
+    Scoring runs for every candidate food, so without this the lowercasing,
+    splitting, and set construction would be repeated per food.
+    """
+    lower: str               # Lowercased query
+    words: frozenset         # Set of query words
+    word_list: tuple         # Query words in order
+    main_ingredient: str     # Last word - often the main ingredient
+    word_count: int          # Number of query words
+    has_processed: bool      # Query itself names a processed form ("dry milk")
+    is_simple: bool          # 1-2 word query (e.g., "whole milk", "apple")
+
+
+def _build_query_context(query: str) -> _QueryContext:
+    """Build the per-query scoring context."""
+    query_lower = query.lower()
+    word_list = tuple(query_lower.split())
+    words = frozenset(word_list)
+    return _QueryContext(
+        lower=query_lower,
+        words=words,
+        word_list=word_list,
+        main_ingredient=word_list[-1] if word_list else "",
+        word_count=len(words),
+        has_processed=bool(PROCESSED_SET & frozenset(_lemma(w) for w in word_list)),
+        is_simple=len(words) <= 2,
+    )
+
+
+@functools.lru_cache(maxsize=10000)
+def _prep_desc(fdc_id: Optional[int], description: str) -> tuple:
+    """
+    Preprocess a food description for scoring, memoized by (fdcId, text).
+
+    The same foods reappear across related queries ("milk", "whole milk",
+    "skim milk"), so the lowercasing, tokenization, and lemmatization are
+    cached per food instead of redone on every scoring run.
+
+    Returns (lower_desc, word_set, lemma_set, first_word_lemma, word_count).
+    """
+    lower = description.lower()
+    words_list = lower.replace(",", " ").split()
+    return (
+        lower,
+        frozenset(words_list),
+        frozenset(_lemma(w) for w in words_list),
+        _lemma(words_list[0]) if words_list else "",
+        len(words_list),
+    )
+
+
+def _plausible(food: Dict[str, Any], ctx: _QueryContext) -> bool:
+    """
+    Cheap lexical gate run before shortlisting and scoring: a candidate is
+    plausible if its description contains the main ingredient or shares at
+    least one word with the query.
+    """
+    lower_desc, desc_words, _, _, _ = _prep_desc(food.get("fdcId"),
+                                                 food.get("description", ""))
+    return ctx.main_ingredient in lower_desc or bool(ctx.words & desc_words)
+
+
+# How many fuzzy-matched candidates survive into full relevance scoring
+_SHORTLIST_SIZE = 5
+
+
+def _shortlist_candidates(foods: List[Dict[str, Any]],
+                          ctx: _QueryContext) -> List[tuple]:
+    """
+    Narrow the candidate list to the closest fuzzy matches before running
+    the full Python scorer.
+
+    rapidfuzz's token_set_ratio runs in compiled code and is robust to
+    word order and small typos, so it makes a cheap, high-recall first
+    cut; the handcrafted domain scoring (compound/processed penalties,
+    data-type priority) then decides among the survivors. Two details
+    keep recall intact:
+
+    - default_process strips punctuation, so USDA's comma form
+      ("Milk, whole, 3.25% milkfat") tokenizes to the same words as the
+      query instead of "milk," never matching "milk".
+    - Every description containing all query words ties at 100, so a
+      hard top-N cut would drop canonical matches on arbitrary tie
+      order; instead, everything tied with the last kept score survives
+      and the (cheap, cached) scorer ranks them.
+
+    Returns (original_position, food) pairs.
+    """
+    if len(foods) <= _SHORTLIST_SIZE:
+        return list(enumerate(foods))
+
+    descriptions = {idx: _prep_desc(food.get("fdcId"), food.get("description", ""))[0]
+                    for idx, food in enumerate(foods)}
+    ranked = process.extract(ctx.lower, descriptions,
+                             scorer=fuzz.token_set_ratio,
+                             processor=utils.default_process,
+                             limit=None)
+    cutoff = ranked[_SHORTLIST_SIZE - 1][1]
+    return [(idx, foods[idx]) for _, score, idx in ranked if score >= cutoff]
+
+
+def _score_relevance(food: Dict[str, Any], ctx: _QueryContext, position: int) -> float:
     """
     Score how relevant a food item is to the search query.
     Higher scores indicate better matches.
-    
+
     Args:
         food: Food item from USDA API
-        query: Original search query
+        ctx: Precomputed query context (see _build_query_context)
         position: Position in the API results (0 = first, most relevant)
-    
+
     Returns:
         Relevance score (higher is better)
     """
-    description = food.get("description", "").lower()
-    query_lower = query.lower()
-    query_words = set(query_lower.split())
-    
+    # Cached preprocessing - a pure lookup when this food was scored before
+    description, desc_words, desc_lemmas, first_word_lemma, desc_word_count = \
+        _prep_desc(food.get("fdcId"), food.get("description", ""))
+
     score = 1000.0  # Base score
-    
+
     # Position penalty (API orders by relevance, so earlier is better)
     score -= position * 10
-    
+
     # Exact match bonus (huge boost)
-    if description == query_lower:
+    if description == ctx.lower:
         score += 500
     # Starts with query (very good match)
-    elif description.startswith(query_lower):
+    elif description.startswith(ctx.lower):
         score += 300
     # Starts with main ingredient word (good match for "Milk, whole" when query is "whole milk")
     # For multi-word queries, the last word is often the main ingredient
-    query_word_list = query_lower.split()
-    main_ingredient = query_word_list[-1] if query_word_list else ""
-    if main_ingredient and description.startswith(main_ingredient):
+    if ctx.main_ingredient and description.startswith(ctx.main_ingredient):
         score += 250
         # If it also contains the full query phrase, give additional bonus
-        if query_lower in description:
+        if ctx.lower in description:
             score += 100
     # Exact phrase match (only if didn't already match above)
-    elif query_lower in description:
+    elif ctx.lower in description:
         score += 200
-    
-    # Word-level matching
-    desc_words = set(description.replace(",", " ").split())
-    matching_words = query_words.intersection(desc_words)
+
+    # Word-level matching (the tokenized/lemmatized views come from the
+    # cached preprocessing above; lemmas are used for the indicator checks
+    # so plural and singular forms - "cracker"/"crackers" - both match)
+    matching_words = ctx.words.intersection(desc_words)
     if matching_words:
         # All query words present (excellent)
-        if matching_words == query_words:
+        if matching_words == ctx.words:
             score += 150
         else:
             # Partial word match
             score += len(matching_words) * 30
-    
+
     # Penalize compound foods when searching for base ingredients
     # If query is simple (1-2 words) but description is complex (3+ words), penalize
-    query_word_count = len(query_words)
-    desc_words_list = description.replace(",", " ").split()
-    desc_word_count = len(desc_words_list)
-    
-    # Common compound food indicators to penalize (especially when they start the description)
-    compound_indicators = ["cheese", "crackers", "bread", "cookies", "cake", 
-                          "soup", "sauce", "dressing", "cereal", "bar", "drink",
-                          "juice", "spread", "butter", "yogurt"]
-    
-    # Processed/preserved forms to penalize when searching for fresh/liquid
-    processed_forms = ["dry", "powdered", "powder", "dehydrated", "canned", "frozen", 
-                       "concentrated", "evaporated", "condensed"]
-    
-    if query_word_count <= 2:  # Simple query (e.g., "whole milk", "apple")
+    if ctx.is_simple:  # Simple query (e.g., "whole milk", "apple")
         # Strongly penalize if description STARTS with compound indicators
         # This indicates a processed food MADE WITH the ingredient, not the ingredient itself
-        first_word = desc_words_list[0] if desc_words_list else ""
-        if first_word in compound_indicators:
+        if first_word_lemma in COMPOUND_SET:
             score -= 800  # Heavy penalty for starting with compound food
-        
-        # Also penalize if compound indicator appears anywhere
-        elif any(indicator in description for indicator in compound_indicators):
+
+        # Also penalize if a compound indicator appears anywhere
+        elif desc_lemmas & COMPOUND_SET:
             score -= 500  # Increased penalty
-        
+
         # Penalize processed/preserved forms when searching for fresh/liquid (unless query specifies it)
         # For "whole milk", prefer liquid over "dry milk" or "powdered milk"
-        if not any(form in query_lower for form in processed_forms):
-            if any(form in description for form in processed_forms):
+        if not ctx.has_processed:
+            if desc_lemmas & PROCESSED_SET:
                 score -= 300  # Penalize processed forms when searching for fresh
-        
+
         # Penalize if description is much longer than query (likely a compound food)
-        if desc_word_count > query_word_count + 1:
+        if desc_word_count > ctx.word_count + 1:
             score -= 150  # Increased penalty
-    
+
     # Data type priority (Foundation > SR Legacy > Survey > others)
     data_type = food.get("dataType", "")
     if data_type == "Foundation":
@@ -213,7 +652,7 @@ def _score_relevance(food: Dict[str, Any], query: str, position: int) -> float:
         score += 50
     elif data_type == "Survey (FNDDS)":
         score += 25
-    
+
     # Food category relevance (e.g., searching "milk" should prefer "Dairy" category)
     food_category_obj = food.get("foodCategory", {})
     if isinstance(food_category_obj, dict):
@@ -222,70 +661,183 @@ def _score_relevance(food: Dict[str, Any], query: str, position: int) -> float:
         food_category = food_category_obj.lower()
     else:
         food_category = ""
-    
-    if "milk" in query_lower and "dairy" in food_category:
+
+    if "milk" in ctx.lower and "dairy" in food_category:
         score += 50
-    if "fruit" in query_lower and "fruit" in food_category:
+    if "fruit" in ctx.lower and "fruit" in food_category:
         score += 50
-    
+
     return score
 
 
-def get_ingredient_nutrition_profile(query: str, api_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+# Completed-profile cache: normalized query -> orjson-serialized profile.
+# Storing bytes keeps the cached entries immutable (callers may mutate the
+# dicts they get back) and compact - a few KB per ingredient.
+PROFILE_CACHE_SIZE = 2048
+_profile_cache: "OrderedDict[str, bytes]" = OrderedDict()
+
+
+def _profile_cache_get(qnorm: str) -> Optional[Dict[str, Any]]:
+    """Return a cached profile for the normalized query, or None."""
+    cached = _profile_cache.get(qnorm)
+    if cached is None:
+        return None
+    _profile_cache.move_to_end(qnorm)  # LRU bookkeeping
+    return orjson.loads(cached)
+
+
+def _profile_cache_put(qnorm: str, profile: Dict[str, Any]) -> bytes:
     """
-    Get generic nutrition profile for an ingredient (excludes branded products).
-    Uses intelligent relevance scoring to find the best match.
-    Prioritizes Foundation, SR Legacy, or Survey data types for generic nutrition information.
-    
-    Note: Nutritional values are standardized per 100 grams for Foundation, SR Legacy, and Survey data types.
-    This is the standard USDA reference serving size for generic foods.
-    
-    Args:
-        query: Search query string (e.g., "whole milk", "apple")
-        api_key: USDA API key (optional, will use USDA_API_KEY from .env if not provided)
-    
-    Returns:
-        Dictionary containing generic ingredient nutrition profile with:
-        - Nutritional values per 100g (standard serving size)
-        - All nutrients with values, units, and daily values
-        - Ingredient description and metadata
-        Returns None if not found
+    Store a completed profile, evicting the least recently used entry.
+    Returns the serialized bytes so callers can reuse them.
+    """
+    serialized = orjson.dumps(profile)
+    _profile_cache[qnorm] = serialized
+    _profile_cache.move_to_end(qnorm)
+    while len(_profile_cache) > PROFILE_CACHE_SIZE:
+        _profile_cache.popitem(last=False)
+    return serialized
+
+
+# In-process negative cache: normalized query -> expiry timestamp
+_miss_cache: Dict[str, float] = {}
+
+# In-flight lookups by normalized query, for coalescing concurrent callers.
+# The check-and-insert below has no await between the two steps, so it is
+# atomic on the event loop and needs no lock (a module-level asyncio.Lock
+# would also break across the separate loops the sync wrapper creates).
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+async def _is_known_miss(qnorm: str) -> bool:
+    """Check whether this query recently came back with no results."""
+    expiry = _miss_cache.get(qnorm)
+    if expiry is not None:
+        if expiry > time.monotonic():
+            return True
+        del _miss_cache[qnorm]
+
+    client = await _get_redis()
+    if client:
+        try:
+            return await client.get(f"usda:miss:{qnorm}") is not None
+        except Exception:
+            pass
+    return False
+
+
+async def _record_miss(qnorm: str) -> None:
+    """Remember a no-result query for MISS_CACHE_TTL seconds."""
+    now = time.monotonic()
+    # Prune expired local entries so the dict stays small
+    for key in [k for k, exp in _miss_cache.items() if exp <= now]:
+        del _miss_cache[key]
+    _miss_cache[qnorm] = now + MISS_CACHE_TTL
+
+    client = await _get_redis()
+    if client:
+        try:
+            await client.setex(f"usda:miss:{qnorm}", MISS_CACHE_TTL, b"1")
+        except Exception:
+            pass
+
+
+async def get_ingredient_nutrition_profile_async(query: str, api_key: Optional[str] = None,
+                                                 client: Optional[httpx.AsyncClient] = None) -> Optional[Dict[str, Any]]:
     """
+    Async variant of get_ingredient_nutrition_profile.
+
+    Accepts an optional httpx.AsyncClient; when none is given the
+    per-event-loop shared client is used, so lookups multiplex over warm
+    connections either way.
+    """
+    # Repeat queries short-circuit the whole pipeline - network, parsing,
+    # and scoring - straight from the completed-profile cache
+    qnorm = query.strip().lower()
+    cached = _profile_cache_get(qnorm)
+    if cached is not None:
+        return cached
+
+    # Known-bad queries skip the three-tier search entirely
+    if await _is_known_miss(qnorm):
+        return None
+
+    # Singleflight: if an identical lookup is already in flight, await its
+    # result instead of multiplying USDA traffic. The future carries the
+    # serialized profile (or None), so each follower deserializes its own
+    # independent copy - handing everyone the same dict would let one
+    # caller's mutations leak into another's result.
+    existing = _inflight.get(qnorm)
+    if existing is not None:
+        serialized = await existing
+        return orjson.loads(serialized) if serialized is not None else None
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[qnorm] = future
+    try:
+        resolved_key = api_key or os.getenv("USDA_API_KEY")
+
+        # Fall back to the per-loop shared client so repeated lookups on
+        # the same loop (the MCP server) reuse warm connections
+        if client is None:
+            client = _shared_async_client()
+        profile = await _get_profile_with_client(client, qnorm, resolved_key)
+
+        if profile is not None:
+            future.set_result(_profile_cache_put(qnorm, profile))
+        else:
+            await _record_miss(qnorm)
+            future.set_result(None)
+
+        return profile
+    except BaseException as exc:
+        future.set_exception(exc)
+        future.exception()  # Mark retrieved in case no follower is waiting
+        raise
+    finally:
+        _inflight.pop(qnorm, None)
+
+
+async def _get_profile_with_client(client: httpx.AsyncClient, query: str,
+                                   api_key: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Run the tier searches, scoring, and nutrient fetch on one client."""
     # Priority order: Foundation > SR Legacy > Survey (FNDDS)
     # These are generic, non-branded foods
-    priority_types = [
-        "Foundation",
-        "SR Legacy", 
-        "Survey (FNDDS)"
-    ]
-    
-    # First, try to get Foundation or SR Legacy foods (most generic)
-    api_response = search_foods(query, api_key, data_type="Foundation,SR Legacy")
-    foods = api_response.get("foods", [])
-    
+
+    # Fire all three tier searches concurrently, then apply the priority.
+    # Only the lightweight per-food metadata is parsed here; nutrients are
+    # extracted later for the winning food alone.
+    tier1, tier2, tier3 = await _search_all_tiers(client, query, api_key)
+
+    # First, prefer Foundation or SR Legacy foods (most generic)
+    foods = _extract_food_meta(tier1)
+
     # If no Foundation/SR Legacy found, try Survey foods
     if not foods:
-        api_response = search_foods(query, api_key, data_type="Survey (FNDDS)")
-        foods = api_response.get("foods", [])
-    
-    # If still no results, search all types but filter out branded
+        foods = _extract_food_meta(tier2)
+
+    # If still no results, use the all-types search but filter out branded
     if not foods:
-        api_response = search_foods(query, api_key)
-        foods = [f for f in api_response.get("foods", []) if f.get("dataType") != "Branded"]
+        foods = [f for f in _extract_food_meta(tier3) if f.get("dataType") != "Branded"]
     
     # Score and rank all foods by relevance
     if not foods:
         return None
     
-    # Score each food item
-    scored_foods = [
-        (food, _score_relevance(food, query, idx))
-        for idx, food in enumerate(foods)
-    ]
-    
-    # Sort by score (highest first) and take the best match
-    scored_foods.sort(key=lambda x: x[1], reverse=True)
-    food, best_score = scored_foods[0]
+    # Build the query-side scoring context once, fuzzy-shortlist the
+    # candidates in compiled code, then take the best-scoring survivor
+    # with a single linear scan (only the winner is needed, so a full
+    # sort and intermediate score list would be wasted work)
+    ctx = _build_query_context(query)
+
+    # Drop candidates that share no words with the query before the heavier
+    # stages; fall back to the full list if the gate filters everything out
+    foods = [f for f in foods if _plausible(f, ctx)] or foods
+
+    _, food = max(
+        _shortlist_candidates(foods, ctx),
+        key=lambda pair: _score_relevance(pair[1], ctx, pair[0])
+    )
     
     # Extract nutrition profile
     # Note: Foundation, SR Legacy, and Survey data types use standard 100g serving size
@@ -302,29 +854,50 @@ def get_ingredient_nutrition_profile(query: str, api_key: Optional[str] = None)
         "nutrients": []
     }
     
-    # Extract all nutrients
-    food_nutrients = food.get("foodNutrients", [])
-    for nutrient in food_nutrients:
-        nutrient_value = nutrient.get("value")
-        # Skip nutrients with None or missing values
-        if nutrient_value is not None:
-            nutrient_info = {
-                "nutrientId": nutrient.get("nutrientId"),
-                "nutrientName": nutrient.get("nutrientName"),
-                "nutrientNumber": nutrient.get("nutrientNumber"),
-                "value": nutrient_value,
-                "unitName": nutrient.get("unitName"),
-                "percentDailyValue": nutrient.get("percentDailyValue"),
-                "rank": nutrient.get("rank")
-            }
-            nutrition_profile["nutrients"].append(nutrient_info)
-    
-    # Sort nutrients by rank (most important first)
-    nutrition_profile["nutrients"].sort(key=lambda x: x.get("rank", 9999))
-    
+    # Fetch nutrients for the winning food only, from the small per-food
+    # endpoint (cheap on the shared connection). Records stay as slotted
+    # Nutrient tuples until the final dict conversion below.
+    food_detail = await _get_food_by_id(client, food["fdcId"], api_key)
+    food_nutrients = [n for n in _flatten_detail_nutrients(food_detail)
+                      if n.value is not None]  # Skip nutrients without values
+
+    # Sort nutrients by rank (most important first), then materialize
+    # dicts only at the JSON boundary
+    food_nutrients.sort(key=lambda n: n.rank if n.rank is not None else 9999)
+    nutrition_profile["nutrients"] = [n._asdict() for n in food_nutrients]
+
     return nutrition_profile
 
 
+def get_ingredient_nutrition_profile(query: str, api_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Get generic nutrition profile for an ingredient (excludes branded products).
+    Uses intelligent relevance scoring to find the best match.
+    Prioritizes Foundation, SR Legacy, or Survey data types for generic nutrition information.
+
+    Note: Nutritional values are standardized per 100 grams for Foundation, SR Legacy, and Survey data types.
+    This is the standard USDA reference serving size for generic foods.
+
+    Args:
+        query: Search query string (e.g., "whole milk", "apple")
+        api_key: USDA API key (optional, will use USDA_API_KEY from .env if not provided)
+
+    Returns:
+        Dictionary containing generic ingredient nutrition profile with:
+        - Nutritional values per 100g (standard serving size)
+        - All nutrients with values, units, and daily values
+        - Ingredient description and metadata
+        Returns None if not found
+    """
+    async def run() -> Optional[Dict[str, Any]]:
+        # Own (and close) the client here: this loop ends with the call,
+        # so the per-loop shared client would just leak its connections
+        async with new_async_client() as client:
+            return await get_ingredient_nutrition_profile_async(query, api_key, client=client)
+
+    return asyncio.run(run())
+
+
 if __name__ == "__main__":
     # Get query from user input
     query = input("Enter an ingredient name (e.g., 'whole milk', 'apple', 'bread'): ").strip()
@@ -379,8 +952,8 @@ if __name__ == "__main__":
         
         # Automatically save to JSON file
         filename = f"{query.replace(' ', '_').lower()}_nutrition_profile.json"
-        with open(filename, 'w') as f:
-            json.dump(nutrition_profile, f, indent=2)
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(nutrition_profile, option=orjson.OPT_INDENT_2))
         print(f"\n✅ Nutrition profile automatically saved to: {filename}")
         
         # Option to display as JSON
@@ -389,7 +962,7 @@ if __name__ == "__main__":
             print("\n" + "="*80)
             print("FULL JSON OUTPUT:")
             print("="*80)
-            print(json.dumps(nutrition_profile, indent=2))
+            print(orjson.dumps(nutrition_profile, option=orjson.OPT_INDENT_2).decode())
             
     except Exception as e:
         print(f"Error: {e}")